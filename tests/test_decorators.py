@@ -5,9 +5,14 @@ import hashlib
 import json
 import os
 import shutil
+import tempfile
+import threading
 import unittest
 
-from utils.decorators import file_cached_property
+from utils.decorators import (
+    cached_property, threaded_cached_property, file_cached_property, mock,
+    singleton, asynchronous
+)
 
 
 class FileCached(object):
@@ -75,5 +80,239 @@ class FileCachedPropertyTest(unittest.TestCase):
         self.assertTrue(hasattr(file_cached_property, shared2))
 
 
+class Cached(object):
+
+    def __init__(self):
+        self.calls = 0
+
+    @cached_property
+    def prop(self):
+        self.calls += 1
+        return self.calls
+
+    @cached_property()
+    def called_prop(self):
+        self.calls += 1
+        return self.calls
+
+    @cached_property(ttl=600)
+    def ttl_prop(self):
+        self.calls += 1
+        return self.calls
+
+    @threaded_cached_property(ttl=600)
+    def threaded_prop(self):
+        self.calls += 1
+        return self.calls
+
+
+class CachedPropertyTest(unittest.TestCase):
+
+    def test_cached_without_ttl(self):
+        obj = Cached()
+        self.assertEqual(obj.prop, 1)
+        self.assertEqual(obj.prop, 1)
+        self.assertEqual(obj.__dict__['prop'], 1)
+
+        del obj.prop
+        self.assertEqual(obj.prop, 2)
+
+        self.assertEqual(obj.called_prop, 3)
+        self.assertEqual(obj.called_prop, 3)
+
+    def test_descriptor_types(self):
+        prop = Cached.__dict__['prop']
+        ttl_prop = Cached.__dict__['ttl_prop']
+        self.assertIsInstance(prop, cached_property)
+        self.assertIsInstance(ttl_prop, cached_property)
+        self.assertIsInstance(
+            Cached.__dict__['threaded_prop'], threaded_cached_property)
+        self.assertEqual(ttl_prop.cache_attr, '_prop_cache_')
+        # no TTL: non-data descriptor, cached value served from __dict__
+        self.assertFalse(hasattr(prop, '__delete__'))
+        self.assertTrue(hasattr(ttl_prop, '__delete__'))
+
+    def test_assigned_after_class_creation(self):
+        def late(obj):
+            obj.calls += 1
+            return obj.calls
+
+        Cached.late = cached_property(late)
+        self.addCleanup(delattr, Cached, 'late')
+        obj = Cached()
+        self.assertEqual(obj.late, 1)
+        self.assertEqual(obj.late, 1)
+
+    def test_delete_ttl_before_evaluated(self):
+        obj = Cached()
+        del obj.ttl_prop
+        self.assertEqual(obj.ttl_prop, 1)
+
+    def test_cached_with_ttl(self):
+        obj = Cached()
+        self.assertEqual(obj.ttl_prop, 1)
+        self.assertEqual(obj.ttl_prop, 1)
+        self.assertIn('ttl_prop', obj._prop_cache_)
+
+        del obj.ttl_prop
+        self.assertEqual(obj.ttl_prop, 2)
+
+    def test_threaded(self):
+        obj = Cached()
+        self.assertEqual(obj.threaded_prop, 1)
+        self.assertEqual(obj.threaded_prop, 1)
+        self.assertIn('threaded_prop', obj._prop_cache_)
+
+
+class Node(object):
+
+    def __init__(self, child=None, barrier=None):
+        self.child = child
+        self.barrier = barrier
+
+    @threaded_cached_property
+    def depth(self):
+        if self.barrier is not None:
+            # make sure both chains are being evaluated at the same time
+            self.barrier.wait(timeout=5)
+        if self.child is None:
+            return 1
+        return self.child.depth + 1
+
+
+class ThreadedCachedPropertyTest(unittest.TestCase):
+
+    def test_crossed_chains(self):
+        # unrelated instances must not share locks, which is tested with
+        # instances whose ids are equal modulo a small stripe count
+        nodes = [Node() for _ in range(128)]
+        buckets = {}
+        for node in nodes:
+            buckets.setdefault((id(node) >> 4) % 16, []).append(node)
+        a, b, c, d = max(buckets.values(), key=len)[:4]
+
+        barrier = threading.Barrier(2)
+        a.child, a.barrier = b, barrier
+        c.child, c.barrier = d, barrier
+        results = {}
+
+        def evaluate(name, node):
+            results[name] = node.depth
+
+        threads = [
+            threading.Thread(target=evaluate, args=('a', a)),
+            threading.Thread(target=evaluate, args=('c', c)),
+        ]
+        for t in threads:
+            t.daemon = True
+            t.start()
+        for t in threads:
+            t.join(timeout=10)
+        self.assertEqual(results, {'a': 2, 'c': 2})
+
+    def test_nested_on_same_instance(self):
+        class Obj(object):
+            @threaded_cached_property
+            def first(self):
+                return self.second + 1
+
+            @threaded_cached_property
+            def second(self):
+                return 1
+
+        self.assertEqual(Obj().first, 2)
+
+
+class SingletonTest(unittest.TestCase):
+
+    def test_reentrant_init(self):
+        inits = []
+
+        @singleton
+        class S(object):
+            def __init__(self):
+                inits.append(self)
+                self.other = S()
+
+        s = S()
+        self.assertIs(S(), s)
+        self.assertIs(s.other, s)
+        self.assertEqual(len(inits), 1)
+
+    def test_init_error(self):
+        calls = []
+
+        @singleton
+        class S(object):
+            def __init__(self):
+                calls.append(1)
+                if len(calls) == 1:
+                    raise ValueError('first time')
+
+        self.assertRaises(ValueError, S)
+        s = S()
+        self.assertIs(S(), s)
+        self.assertEqual(len(calls), 2)
+
+
+class AsynchronousTest(unittest.TestCase):
+
+    def setUp(self):
+        # use a fresh pool of a single thread
+        saved = asynchronous._executor, asynchronous.max_workers
+        asynchronous._executor, asynchronous.max_workers = None, 1
+
+        def restore():
+            if asynchronous._executor is not None:
+                asynchronous._executor.shutdown()
+            asynchronous._executor, asynchronous.max_workers = saved
+
+        self.addCleanup(restore)
+
+    def test_nested_wait(self):
+        @asynchronous
+        def leaf(n):
+            return n
+
+        @asynchronous
+        def node(n):
+            return sum(leaf.start(i).wait() for i in range(n))
+
+        results = [node.start(3), node.start(4)]
+        self.assertEqual([r.wait() for r in results], [3, 6])
+
+    def test_exception(self):
+        @asynchronous
+        def fail():
+            raise KeyError('fail')
+
+        self.assertRaises(KeyError, fail.start().wait)
+
+
+class MockTest(unittest.TestCase):
+
+    def test_multiple_files(self):
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        file1 = os.path.join(tmpdir, 'mock1.json')
+        file2 = os.path.join(tmpdir, 'mock2.json')
+        with open(file1, 'w') as fd:
+            json.dump({'foo': 'from file1'}, fd)
+        with open(file2, 'w') as fd:
+            json.dump({'bar': 'from file2'}, fd)
+
+        @mock(key='foo', file=file1, ttl=0)
+        def foo():
+            raise NotImplementedError()
+
+        @mock(key='bar', file=file2, ttl=0)
+        def bar():
+            raise NotImplementedError()
+
+        self.assertEqual(foo(), 'from file1')
+        self.assertEqual(bar(), 'from file2')
+        self.assertEqual(foo(), 'from file1')
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,120 @@
+import json
+import unittest
+
+import django
+from django.conf import settings
+
+if not settings.configured:
+    settings.configure(
+        DEBUG=False,
+        ALLOWED_HOSTS=['*'],
+        INSTALLED_APPS=['django.contrib.contenttypes', 'django.contrib.auth'],
+    )
+    django.setup()
+
+from django.test import RequestFactory
+
+from utils import exceptions as api_exc
+from utils.django.api import api_view
+
+
+class ApiViewJSONTest(unittest.TestCase):
+
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    def get_data(self, data):
+        view = api_view(lambda request: data)
+        response = view(self.factory.get('/'))
+        self.assertEqual(response.status_code, 200)
+        return response.content
+
+    def test_response(self):
+        content = self.get_data({'a': [1, 'x', None], 'b': {'c': 1.5}})
+        self.assertEqual(json.loads(content), {
+            'code': 'ok',
+            'data': {'a': [1, 'x', None], 'b': {'c': 1.5}},
+        })
+
+    def test_response_big_integer(self):
+        content = self.get_data({'n': 2 ** 70})
+        self.assertEqual(json.loads(content)['data'], {'n': 2 ** 70})
+
+    def test_response_non_finite_floats(self):
+        content = self.get_data([None, float('nan'), float('inf')])
+        self.assertEqual(
+            json.loads(content)['data'][2], float('inf'))
+        self.assertIn(b'NaN', content)
+
+
+class ApiViewErrorTest(unittest.TestCase):
+
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    def get_error(self, exc):
+        def view(request):
+            raise exc
+
+        response = api_view(view)(self.factory.get('/'))
+        return response.status_code, json.loads(response.content)
+
+    def test_default_detail(self):
+        for _ in range(2):
+            status, body = self.get_error(api_exc.NotFound())
+            self.assertEqual(status, 404)
+            self.assertEqual(body, {'code': 'not_found',
+                                    'message': 'Not found.'})
+
+    def test_nested_detail(self):
+        status, body = self.get_error(api_exc.ValidationError(
+            {'name': ['Required.'], 'items': [{'id': ['Invalid.']}]}))
+        self.assertEqual(status, 400)
+        self.assertEqual(body['code'], 'error_with_detail')
+        self.assertEqual(body['detail'], {
+            'name': ['Required.'], 'items': [{'id': ['Invalid.']}],
+        })
+
+
+class ApiViewParseBodyTest(unittest.TestCase):
+
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    def parse(self, body, content_type='application/json'):
+        view = api_view(lambda request: getattr(request, '_JSON', None),
+                        parse_body=True)
+        request = self.factory.post('/', data=body, content_type=content_type)
+        response = view(request)
+        return response.status_code, request.__dict__.get('_JSON')
+
+    def test_parse_json(self):
+        status, data = self.parse('{"a": [1, "x", null], "b": 1.5}')
+        self.assertEqual(status, 200)
+        self.assertEqual(data, {'a': [1, 'x', None], 'b': 1.5})
+
+    def test_parse_big_integers(self):
+        status, data = self.parse(
+            '[123456789012345678901234567890, -9223372036854775809]')
+        self.assertEqual(status, 200)
+        self.assertEqual(
+            data, [123456789012345678901234567890, -9223372036854775809])
+        self.assertIsInstance(data[1], int)
+
+    def test_parse_non_finite_floats(self):
+        status, data = self.parse('[NaN, Infinity]')
+        self.assertEqual(status, 200)
+        self.assertEqual(data[1], float('inf'))
+
+    def test_parse_invalid(self):
+        status, data = self.parse('{bad')
+        self.assertEqual(status, 400)
+        self.assertIsNone(data)
+
+        # malformed requests without content type are not rejected
+        status, data = self.parse('{bad', content_type='')
+        self.assertEqual(status, 200)
+
+
+if __name__ == '__main__':
+    unittest.main()
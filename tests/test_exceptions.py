@@ -0,0 +1,112 @@
+import copy
+import pickle
+import unittest
+
+from utils import exceptions as api_exc
+
+
+class FormatDetailTest(unittest.TestCase):
+
+    def test_method_not_allowed(self):
+        exc = api_exc.MethodNotAllowed('PUT')
+        self.assertEqual(exc.detail, 'Method "PUT" not allowed.')
+        self.assertEqual(exc.detail.code, 'method_not_allowed')
+
+    def test_unhashable_arguments(self):
+        exc = api_exc.MethodNotAllowed(['GET'])
+        self.assertEqual(exc.detail, 'Method "[\'GET\']" not allowed.')
+
+
+class ErrorDetailsTest(unittest.TestCase):
+
+    def test_nested_details(self):
+        exc = api_exc.ValidationError({
+            'name': ['This field is required.'],
+            'items': [
+                {'id': ['Invalid id.', 'Too large.']},
+                {},
+                [api_exc.ErrorDetail('Nested.', code='nested')],
+            ],
+            'count': 1,
+        }, code='invalid_input')
+
+        detail = exc.detail
+        self.assertEqual(list(detail), ['name', 'items', 'count'])
+        self.assertEqual(detail['items'][0]['id'],
+                         ['Invalid id.', 'Too large.'])
+        self.assertEqual(detail['items'][1], {})
+        self.assertIsInstance(detail['count'], api_exc.ErrorDetail)
+        self.assertEqual(detail['count'], '1')
+
+        self.assertEqual(exc.get_codes(), {
+            'name': ['invalid_input'],
+            'items': [
+                {'id': ['invalid_input', 'invalid_input']},
+                {},
+                ['nested'],
+            ],
+            'count': 'invalid_input',
+        })
+        self.assertEqual(exc.get_full_details()['items'][2], [
+            {'message': 'Nested.', 'code': 'nested'},
+        ])
+
+    def test_list_order(self):
+        messages = ['m%d' % i for i in range(20)]
+        exc = api_exc.ValidationError([messages[:10], messages[10:]])
+        self.assertEqual(exc.detail, [messages[:10], messages[10:]])
+        full = exc.get_full_details()
+        self.assertEqual([d['message'] for d in full[1]], messages[10:])
+
+    def test_code_propagation(self):
+        exc = api_exc.APIException(
+            ['plain', api_exc.ErrorDetail('coded', code='mine')],
+            code='default')
+        self.assertEqual(exc.get_codes(), ['default', 'mine'])
+
+        exc = api_exc.NotFound()
+        self.assertEqual(exc.get_codes(), 'not_found')
+        self.assertEqual(exc.get_full_details(), {
+            'message': 'Not found.', 'code': 'not_found',
+        })
+
+    def test_pickle_and_copy(self):
+        detail = api_exc.ErrorDetail('Invalid.', code='invalid')
+        copies = [copy.copy(detail), copy.deepcopy(detail)]
+        for protocol in range(pickle.HIGHEST_PROTOCOL + 1):
+            copies.append(pickle.loads(pickle.dumps(detail, protocol)))
+        for other in copies:
+            self.assertIs(type(other), api_exc.ErrorDetail)
+            self.assertEqual(other, 'Invalid.')
+            self.assertEqual(other.code, 'invalid')
+
+    def test_deep_nesting(self):
+        data = 'deepest'
+        for _ in range(2000):
+            data = [data]
+        exc = api_exc.ValidationError(data)
+        detail = exc.detail
+        for _ in range(2000):
+            detail = detail[0]
+        self.assertEqual(detail, 'deepest')
+        self.assertEqual(detail.code, 'invalid')
+
+    def test_reference_cycle(self):
+        data = []
+        data.append(data)
+        with self.assertRaises(ValueError):
+            api_exc.ValidationError(data)
+        data = {'field': {}}
+        data['field']['nested'] = [data]
+        with self.assertRaises(ValueError):
+            api_exc.ValidationError(data)
+
+    def test_shared_reference(self):
+        shared = ['Invalid.']
+        exc = api_exc.ValidationError({'a': shared, 'b': [shared, shared]})
+        self.assertEqual(exc.detail, {'a': ['Invalid.'],
+                                      'b': [['Invalid.'], ['Invalid.']]})
+
+
+if __name__ == '__main__':
+    unittest.main()
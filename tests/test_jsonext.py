@@ -0,0 +1,99 @@
+import io
+import json
+import os
+import tempfile
+import unittest
+
+from utils import jsonext
+
+
+class JsonextTest(unittest.TestCase):
+
+    def test_comments_and_trailing_commas(self):
+        content = '''
+        {
+            // A comment!
+            "testing": {
+                "foo": "bar", // <-- A trailing comma!
+                "arr": [1, 2, /* inline */ 3, ],
+            }, // <-- Another one!
+            /*
+            This style of comments will also be safely removed
+            */
+        }
+        '''
+        data = jsonext.load(io.StringIO(content))
+        self.assertEqual(data, {'testing': {'foo': 'bar', 'arr': [1, 2, 3]}})
+
+    def test_strings_are_kept(self):
+        content = r'''
+        {
+            "url": "http://example.com/*path*/",
+            "comma": "a,}b,]",
+            "quote": "\" // not a comment",
+        }
+        '''
+        data = jsonext.load(io.StringIO(content))
+        self.assertEqual(data, {
+            'url': 'http://example.com/*path*/',
+            'comma': 'a,}b,]',
+            'quote': '" // not a comment',
+        })
+
+    def test_comment_between_comma_and_bracket(self):
+        data = jsonext.load(io.StringIO('[1, 2, // last\n /* end */ ]'))
+        self.assertEqual(data, [1, 2])
+
+    def test_big_integers(self):
+        data = jsonext.loads(
+            '[123456789012345678901234567890, -9223372036854775809, ]')
+        self.assertEqual(
+            data, [123456789012345678901234567890, -9223372036854775809])
+        self.assertIsInstance(data[0], int)
+        self.assertIsInstance(data[1], int)
+
+    def test_non_finite_floats(self):
+        data = jsonext.loads('[NaN, Infinity, 1.5]')
+        self.assertNotEqual(data[0], data[0])
+        self.assertEqual(data[1:], [float('inf'), 1.5])
+
+    def test_fast_dumps(self):
+        cases = [
+            {'a': [1, 'x', None], 'b': 1.5},
+            {1: 'int key'},
+            [2 ** 70, -2 ** 70],
+            [None, float('nan'), float('-inf')],
+        ]
+        for data in cases:
+            self.assertEqual(json.loads(jsonext.fast_dumps(data)),
+                             json.loads(json.dumps(data)))
+        self.assertIn(b'NaN', jsonext.fast_dumps([float('nan')]))
+
+    def test_fast_loads(self):
+        for content in ['{"a": [1, "x", null]}',
+                        '[123456789012345678901234567890]',
+                        '[-9223372036854775809, NaN, Infinity]']:
+            expected = json.loads(content)
+            self.assertEqual(repr(jsonext.fast_loads(content)),
+                             repr(expected))
+            self.assertEqual(repr(jsonext.fast_loads(content.encode())),
+                             repr(expected))
+        self.assertRaises(ValueError, jsonext.fast_loads, '{bad')
+
+    def test_import(self):
+        with tempfile.TemporaryDirectory() as root:
+            files = {
+                'a.json': '{"x": 1, // comment\n}',
+                'b.json': '["@import(a.json)", 2, ]',
+                'main.json':
+                    '{"a": "@import(a.json)", "b": "@import(b.json)"}',
+            }
+            for name, content in files.items():
+                with open(os.path.join(root, name), 'w') as fd:
+                    fd.write(content)
+            data = jsonext.load_file(os.path.join(root, 'main.json'))
+        self.assertEqual(data, {'a': {'x': 1}, 'b': [{'x': 1}, 2]})
+
+
+if __name__ == '__main__':
+    unittest.main()
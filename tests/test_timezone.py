@@ -0,0 +1,48 @@
+# -*- coding:utf-8 -*-
+from datetime import datetime, timedelta
+import unittest
+import zoneinfo
+
+from utils import timezone
+
+
+def _zone(name):
+    try:
+        return zoneinfo.ZoneInfo(name)
+    except zoneinfo.ZoneInfoNotFoundError:
+        raise unittest.SkipTest('time zone %s not available' % name)
+
+
+class MakeAwareTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tz = _zone('Europe/Paris')
+
+    def test_ambiguous_time_honours_is_dst(self):
+        value = datetime(2021, 10, 31, 2, 30)
+        summer = timezone.make_aware(value, self.tz, is_dst=True)
+        winter = timezone.make_aware(value, self.tz, is_dst=False)
+        self.assertEqual(summer.utcoffset(), timedelta(hours=2))
+        self.assertEqual(winter.utcoffset(), timedelta(hours=1))
+
+    def test_nonexistent_time_honours_is_dst(self):
+        value = datetime(2021, 3, 28, 2, 30)
+        summer = timezone.make_aware(value, self.tz, is_dst=True)
+        winter = timezone.make_aware(value, self.tz, is_dst=False)
+        self.assertEqual(summer.utcoffset(), timedelta(hours=2))
+        self.assertEqual(winter.utcoffset(), timedelta(hours=1))
+
+    def test_is_dst_ignored_away_from_transitions(self):
+        value = datetime(2021, 7, 1, 12, 0)
+        aware = timezone.make_aware(value, self.tz, is_dst=False)
+        self.assertEqual(aware.utcoffset(), timedelta(hours=2))
+        self.assertEqual(aware.fold, 0)
+
+    def test_aware_value_rejected(self):
+        value = datetime(2021, 7, 1, tzinfo=self.tz)
+        with self.assertRaises(ValueError):
+            timezone.make_aware(value, self.tz)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -19,7 +19,7 @@ class KVStoreClient(object):
             sa.text(
                 u"""
                 select v from {} where k = :key
-                where expire_at < :now
+                and (expire_at is null or expire_at > :now)
                 """.format(self.tb_name)
             ),
             key=key, now=datetime.datetime.now()
@@ -42,7 +42,7 @@ class KVStoreClient(object):
                 insert into {} (k, v, create_at, update_at, expire_at)
                 values (:key, :value, now(), now(), :expire_at)
                 on conflict (k) do update
-                    set value = excluded.value,
+                    set v = excluded.v,
                         update_at = excluded.update_at,
                         expire_at = excluded.expire_at
                 """.format(self.tb_name)
@@ -66,7 +66,7 @@ class KVStoreClient(object):
                 u"""
                 delete from {} where k = :key
                 """.format(self.tb_name)
-            ).execution_options(autococmmit=True),
+            ).execution_options(autocommit=True),
             key=key
         )
         return result.rowcount
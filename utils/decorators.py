@@ -20,15 +20,21 @@ import warnings
 import weakref
 
 from six import PY2, PY3, b, u, reraise
-from six.moves import queue
 
 from . import jsonext
 
 if PY2:
     from io import open
 
+# TTL of in-memory caches is measured with a monotonic clock, so that
+# system clock adjustments do not expire or pin cached values
+_monotonic = getattr(time, 'monotonic', time.time)
+
 _logger = logging.getLogger(__name__)
 
+# sentinel for cache misses, None may be a valid cached value
+_missing = object()
+
 
 class cached_attribute(object):
     """
@@ -64,7 +70,9 @@ class cached_attribute(object):
     attribute of the class which is wrapped by this decorator. Each entry
     in the cache is created only when the property is accessed for the
     first time and is a two-element tuple with the last computed attribute
-    value and the last time it was updated in seconds since the epoch.
+    value and the last time it was updated, in seconds of a monotonic
+    clock (time.monotonic, or time.time on Python 2), which can only be
+    compared with each other, not with wall-clock time.
 
     The cache dictionary attribute can be specified using the 'cache_attr'
     parameter of the decorator constructor.
@@ -95,7 +103,7 @@ class cached_attribute(object):
             setattr(cls, self.__name__, value)
             return value
 
-        now = time.time()
+        now = _monotonic()
         with self.lock:
             try:
                 value, last_updated = getattr(
@@ -121,8 +129,7 @@ class cached_attribute(object):
 
 class cached_property(object):
     """
-    Thread safe decorator for readonly properties evaluated only once
-    within TTL period.
+    Decorator for readonly properties evaluated only once within TTL period.
 
     The default time-to-live (TTL) is 0 which is never expire, which
     will result the property be replaced by the value when first accessed.
@@ -152,7 +159,9 @@ class cached_property(object):
     for every property of the object which is wrapped by this decorator.
     Each entry in the cache is created only when the property is accessed
     for the first time and is a two-element tuple with the last computed
-    property value and the last time it was updated in seconds since the epoch.
+    property value and the last time it was updated, in seconds of a
+    monotonic clock (time.monotonic, or time.time on Python 2), which can
+    only be compared with each other, not with wall-clock time.
 
     The cache dictionary attribute can be specified using the 'cache_attr'
     parameter of the decorator constructor.
@@ -162,11 +171,30 @@ class cached_property(object):
         del instance.property
         # or: del instance._prop_cache_[<property name>]
 
+    Without TTL, the value is stored in the instance's __dict__ directly,
+    and no lock is held. The property is then a non-data descriptor,
+    cached values are read from the instance's __dict__ without calling
+    the descriptor at all. To expire it manually just do:
+
+        del instance.property
+        # or: del instance.__dict__[<property name>]
+
+    Like any other instance attribute, deleting a property without TTL
+    which has not been evaluated raises AttributeError.
+
+    No lock is held when evaluating the property, which makes it cheap
+    but not thread safe, use threaded_cached_property instead where the
+    property may be evaluated concurrently by multiple threads.
+
     """
+    def __new__(cls, func=None, ttl=0, cache_attr='_prop_cache_'):
+        if ttl > 0 and not issubclass(cls, _ExpiringProperty):
+            cls = _expiring_type(cls)
+        return super(cached_property, cls).__new__(cls)
+
     def __init__(self, func=None, ttl=0, cache_attr='_prop_cache_'):
         self.cache_attr = cache_attr
         self.ttl = ttl
-        self.lock = threading.RLock()
 
         if func is not None:
             self.__call__(func)
@@ -176,36 +204,106 @@ class cached_property(object):
         self.func = func
         return self
 
+    def __set_name__(self, owner, name):
+        # key the cache by the attribute name, which may differ from the
+        # name of the getter function, e.g. when a lambda is wrapped
+        self.__name__ = name
+
     def __get__(self, obj, cls=None):
         if obj is None:
             return self
 
+        value = self._lookup(obj)
+        if value is _missing:
+            value = self._evaluate(obj)
+        return value
+
+    def _lookup(self, obj):
+        """Return the cached value, or _missing if absent or expired."""
+        obj_dict = obj.__dict__
+        if self.ttl <= 0:
+            # check the instance dict, another thread may have evaluated
+            # the property while threaded_cached_property waits the lock
+            return obj_dict.get(self.__name__, _missing)
+
+        cache = obj_dict.get(self.cache_attr)
+        if cache is None:
+            return _missing
+        entry = cache.get(self.__name__)
+        if entry is None or self.ttl < _monotonic() - entry[1]:
+            return _missing
+        return entry[0]
+
+    def _evaluate(self, obj):
+        value = self.func(obj)
+        obj_dict = obj.__dict__
         if self.ttl <= 0:
-            value = obj.__dict__[self.__name__] = self.func(obj)
+            obj_dict[self.__name__] = value
             return value
 
-        now = time.time()
-        with self.lock:
-            try:
-                value, last_updated = getattr(
-                    obj, self.cache_attr)[self.__name__]
-                if self.ttl < now - last_updated:
-                    raise AttributeError
-            except (KeyError, AttributeError):
-                value = self.func(obj)
-                try:
-                    cache = getattr(obj, self.cache_attr)
-                except AttributeError:
-                    cache = {}
-                    setattr(obj, self.cache_attr, cache)
-                cache[self.__name__] = (value, now)
-            return value
+        cache = obj_dict.get(self.cache_attr)
+        if cache is None:
+            cache = obj_dict[self.cache_attr] = {}
+        cache[self.__name__] = (value, _monotonic())
+        return value
+
+
+class _ExpiringProperty(object):
+    """
+    Mixin for cached properties with TTL, the __delete__ method makes
+    them data descriptors, so they can be expired even before evaluated.
+    Values with TTL are kept in the cache attribute, instead of the
+    instance's __dict__, the descriptor is called on every access anyway.
+    """
 
     def __delete__(self, obj):
-        try:
-            del getattr(obj, self.cache_attr)[self.__name__]
-        except (AttributeError, KeyError):
-            pass
+        cache = obj.__dict__.get(self.cache_attr)
+        if cache is not None:
+            cache.pop(self.__name__, None)
+
+
+_expiring_types = {}
+
+
+def _expiring_type(cls):
+    """Return the subclass of a cached property class used with TTL."""
+    expiring = _expiring_types.get(cls)
+    if expiring is None:
+        expiring = type(cls.__name__, (_ExpiringProperty, cls),
+                        {'__module__': cls.__module__})
+        _expiring_types[cls] = expiring
+    return expiring
+
+
+class threaded_cached_property(cached_property):
+    """
+    Thread safe version of cached_property, the property is evaluated
+    with a lock held, so it is only evaluated once within TTL period
+    even accessed concurrently by multiple threads.
+
+    Cached values are read without locking, the lock is only acquired
+    when the property needs to be evaluated. Each instance has its own
+    reentrant lock, stored in its '_prop_lock_' attribute and shared by
+    all threaded cached properties of the instance, so locks are taken
+    in the same order as properties depend on each other.
+    """
+
+    def __get__(self, obj, cls=None):
+        if obj is None:
+            return self
+
+        value = self._lookup(obj)
+        if value is _missing:
+            # dict.setdefault is atomic, concurrent threads get the same
+            # lock even if the instance has no lock yet
+            lock = obj.__dict__.setdefault('_prop_lock_', threading.RLock())
+            with lock:
+                # check again, another thread may have evaluated it
+                # while we were waiting for the lock
+                value = self._lookup(obj)
+                if value is _missing:
+                    value = self._evaluate(obj)
+        return value
 
 
 class file_cached_property(object):
@@ -242,10 +340,9 @@ class file_cached_property(object):
             return self
 
         self.touch_cache(obj)
-        now = time.time()
         try:
             value, last_updated = obj._file_cached[self.key]
-            if 0 < self.ttl < now - last_updated:
+            if 0 < self.ttl < time.time() - last_updated:
                 _logger.debug('found expired cache for key: %s', self.key)
                 raise KeyError
         except KeyError:
@@ -419,12 +516,14 @@ def retry_on_error(tries, delay=3, backoff=2,
     if delay <= 0:
         raise ValueError("delay must be greater than 0")
 
+    # pairs of (tries_remaining, delay) computed once for all calls
+    schedule = tuple((tries - i - 1, delay * backoff ** i)
+                     for i in range(tries))
+
     def deco(func):
         @functools.wraps(func)
         def wrapper(*args, **kwargs):
-            m_delay = delay
-            m_tries = list(reversed(range(tries)))
-            for tries_remaining in m_tries:
+            for tries_remaining, m_delay in schedule:
                 try:
                     return func(*args, **kwargs)
                 except exceptions as err:
@@ -432,7 +531,6 @@ def retry_on_error(tries, delay=3, backoff=2,
                         if hook is not None:
                             hook(tries_remaining, err, m_delay)
                         time.sleep(m_delay)
-                        m_delay = m_delay * backoff
                     else:
                         raise
 
@@ -461,23 +559,20 @@ def retry_on_false(tries, delay=3, backoff=2):
     if delay <= 0:
         raise ValueError("delay must be greater than 0")
 
+    delays = tuple(delay * backoff ** i for i in range(tries))
+
     def deco(func):
         @functools.wraps(func)
         def wrapper(*args, **kwargs):
-            m_tries, m_delay = tries, delay
-
             rv = func(*args, **kwargs)
-            while m_tries > 0:
+            for m_delay in delays:
                 if rv is True:
                     return True
 
-                m_tries -= 1
                 time.sleep(m_delay)
-                m_delay *= backoff
-
                 rv = func(*args, **kwargs)
 
-            return False
+            return rv is True
 
         return wrapper
 
@@ -564,10 +659,12 @@ def disabled(func):
 
 
 class _LogDecorator(object):
+    """
+    Base class of the logging decorators.
 
-    DEFAULT_LEVEL = logging.DEBUG
-    DEFAULT_FORMAT = '[%(levelname)1.1s %(asctime)s %(name)s] %(message)s'
-    DEFAULT_DATE_FORMAT = '%y%m%d %H:%M:%S'
+    The decorators don't configure the logging system, which is left to
+    the application, e.g. by utils.log.config_logger.
+    """
 
     logger_name = 'LogDecorator'
 
@@ -575,10 +672,6 @@ class _LogDecorator(object):
                 logger=None, level=None, logger_name=None, propagate=True):
         self = object.__new__(cls)
 
-        # Do basic configuration for the logging system if not already
-        logging.basicConfig(level=cls.DEFAULT_LEVEL,
-                            format=cls.DEFAULT_FORMAT,
-                            datefmt=cls.DEFAULT_DATE_FORMAT)
         self.level = level or (logger and logger.level) or logging.root.level
         if logger is None:
             self.logger_name = logger_name or cls.logger_name
@@ -607,6 +700,16 @@ class _LogDecorator(object):
         raise NotImplementedError()
 
 
+def _positional_arg_names(func):
+    if PY2:
+        return tuple(inspect.getargspec(func).args)
+    positional = (inspect.Parameter.POSITIONAL_ONLY,
+                  inspect.Parameter.POSITIONAL_OR_KEYWORD)
+    return tuple(name for name, param
+                 in inspect.signature(func).parameters.items()
+                 if param.kind in positional)
+
+
 class log_parameters(_LogDecorator):
     """
     Dumps out the arguments passed to a function before calling it.
@@ -615,15 +718,26 @@ class log_parameters(_LogDecorator):
           or it won't work.
     """
     def __call__(self, func):
-        arg_names = inspect.getargspec(func).args
+        arg_names = _positional_arg_names(func)
+        n_names = len(arg_names)
+        # format templates for calls with 0 to n_names positional arguments
+        arg_formats = tuple(
+            ', '.join('%s=%%s' % name for name in arg_names[:n])
+            for n in range(n_names + 1))
         f_name = func.__name__
+        logger, level = self.logger, self.level
 
         @functools.wraps(func)
         def wrapper(*args, **kwargs):
-            self.logger.log(self.level, '%s : %s', f_name, ', '.join(
-                '%s=%s' % entry
-                for entry in itertools.chain(
-                    zip(arg_names, args), kwargs.items())))
+            # don't bother formatting the arguments if it won't be logged
+            if logger.isEnabledFor(level):
+                n = min(len(args), n_names)
+                params = arg_formats[n] % args[:n]
+                if kwargs:
+                    kw_params = ', '.join(['%s=%s'] * len(kwargs)) % tuple(
+                        itertools.chain.from_iterable(kwargs.items()))
+                    params = params + ', ' + kw_params if n else kw_params
+                logger.log(level, '%s : %s', f_name, params)
             return func(*args, **kwargs)
 
         return wrapper
@@ -637,17 +751,21 @@ class log_events(_LogDecorator):
 
     def __call__(self, func):
         f_name = func.__name__
+        logger, level = self.logger, self.level
 
         @functools.wraps(func)
         def wrapper(*args, **kwargs):
-            self.logger.log(self.level, 'Entering %s', f_name)
+            if not logger.isEnabledFor(level):
+                return func(*args, **kwargs)
+
+            logger.log(level, 'Entering %s', f_name)
             try:
                 f_result = func(*args, **kwargs)
             except Exception as err:
-                self.logger.log(self.level, 'Exception in %s', f_name)
+                logger.log(level, 'Exception in %s', f_name)
                 raise
             else:
-                self.logger.log(self.level, 'Exiting %s', f_name)
+                logger.log(level, 'Exiting %s', f_name)
                 return f_result
 
         return wrapper
@@ -673,24 +791,30 @@ class print_to_log(_LogDecorator):
 
     @property
     def buf(self):
-        if not hasattr(self, '_buf'):
-            setattr(self, '_buf', [])
-        return self._buf
+        buf = self.__dict__.get('_buf')
+        if buf is None:
+            buf = self._buf = []
+        return buf
 
     @buf.setter
     def buf(self, buf):
-        setattr(self, '_buf', buf)
+        self._buf = buf
 
     def write(self, text):
+        # discard the output directly if it won't be logged
+        if not self.logger.isEnabledFor(self.level):
+            return
         self.buf.append(text)
         if text.endswith('\n'):
             self.flush()
 
     def flush(self):
+        if not self.buf:
+            return
         output = ''.join(self.buf).rstrip()
+        self.buf = []
         if output:
             self.logger.log(self.level, output)
-            self.buf = []
 
     def isatty(self):
         """For compatibility."""
@@ -729,10 +853,28 @@ def singleton(cls):
         if it is not None:
             return it
 
-        cls.__it__ = it = cls.__new_original__(cls, *args, **kwargs)
-        it.__init_original__(*args, **kwargs)
+        with cls.__singleton_lock__:
+            # check again, another thread may have created the instance
+            # while we were waiting for the lock, or the instance is being
+            # initialized and the class is called again from __init__
+            it = cls.__dict__.get('__it__')
+            if it is None:
+                it = cls.__dict__.get('__singleton_initializing__')
+            if it is not None:
+                return it
+
+            it = cls.__new_original__(cls, *args, **kwargs)
+            # the lock is reentrant, publish the instance to the current
+            # thread only, other threads wait until it is initialized
+            cls.__singleton_initializing__ = it
+            try:
+                it.__init_original__(*args, **kwargs)
+            finally:
+                del cls.__singleton_initializing__
+            cls.__it__ = it
         return it
 
+    cls.__singleton_lock__ = threading.RLock()
     cls.__new_original__ = cls.__new__
     cls.__new__ = singleton_new
 
@@ -742,6 +884,26 @@ def singleton(cls):
     return cls
 
 
+# marks threads of the asynchronous thread pool
+_async_worker = threading.local()
+
+
+def _mark_async_worker():
+    _async_worker.active = True
+
+
+def _run_in_future(future, func, args, kwargs):
+    _mark_async_worker()
+    if not future.set_running_or_notify_cancel():
+        return
+    try:
+        result = func(*args, **kwargs)
+    except BaseException as err:
+        future.set_exception(err)
+    else:
+        future.set_result(result)
+
+
 class asynchronous(object):
     """
     Make function calling asynchronously. Usage example:
@@ -772,66 +934,70 @@ class asynchronous(object):
         result3 = long_process.start(5)
         print("result3 {0}".format(result3.wait())
 
+    The functions are run by a thread pool shared by all asynchronous
+    functions, which has at most `asynchronous.max_workers` threads,
+    the default None means min(32, os.cpu_count() + 4). Set it before
+    any function is started to change the pool size:
+
+        asynchronous.max_workers = 64
+
+    A function started from another asynchronous function, which may
+    wait for its result, is run in a new thread of its own instead of
+    the pool, nested start() and wait() chains can not deadlock even
+    when all threads of the pool are waiting.
+
     """
+    max_workers = None
+    _executor = None
+    _executor_lock = threading.Lock()
+
     def __init__(self, func):
         functools.update_wrapper(self, func)
         self.func = func
-        self.err, self.exc_info = False, None
-
-        def threaded(*args, **kwargs):
-            try:
-                self.queue.put(self.func(*args, **kwargs))
-            except Exception as err:
-                self.err = True
-                self.exc_info = sys.exc_info()
-            finally:
-                self.wait_event.set()
-
-        self.threaded = threaded
 
     def __call__(self, *args, **kwargs):
         return self.func(*args, **kwargs)
 
+    @staticmethod
+    def get_executor():
+        if asynchronous._executor is None:
+            with asynchronous._executor_lock:
+                if asynchronous._executor is None:
+                    from concurrent.futures import ThreadPoolExecutor
+                    asynchronous._executor = ThreadPoolExecutor(
+                        max_workers=asynchronous.max_workers,
+                        initializer=_mark_async_worker)
+        return asynchronous._executor
+
     def start(self, *args, **kwargs):
-        self.queue = queue.Queue()
-        self.wait_event = threading.Event()
-        self.thread = threading.Thread(
-            target=self.threaded, args=args, kwargs=kwargs)
-        self.thread.start()
-        return asynchronous.Result(self)
+        if getattr(_async_worker, 'active', False):
+            from concurrent.futures import Future
+            future = Future()
+            thread = threading.Thread(
+                target=_run_in_future,
+                args=(future, self.func, args, kwargs))
+            thread.start()
+        else:
+            future = self.get_executor().submit(self.func, *args, **kwargs)
+        return asynchronous.Result(future)
 
     class NotYetDoneException(Exception):
         pass
 
     class Result(object):
-        def __init__(self, refer):
-            self.refer = refer
-            self._is_done = False
+        def __init__(self, future):
+            self.future = future
 
         def is_done(self):
-            if not self._is_done:
-                if self.refer.queue.empty():
-                    if self.refer.thread.is_alive():
-                        return False
-            self._is_done = True
-            return True
+            return self.future.done()
 
         def result(self):
-            if not self.is_done():
+            if not self.future.done():
                 raise asynchronous.NotYetDoneException()
-            if self.refer.err:
-                exc_info = self.refer.exc_info
-                reraise(exc_info[0], exc_info[1], exc_info[2])
-
-            # cache the result, or deadlock happens when you retrieve
-            # the result more than once
-            if not hasattr(self, '_result'):
-                setattr(self, '_result', self.refer.queue.get())
-            return self._result
+            return self.future.result()
 
         def wait(self):
-            self.refer.wait_event.wait()
-            return self.result()
+            return self.future.result()
 
 
 @singleton
@@ -892,8 +1058,15 @@ class _Mock(object):
                 raise IOError('mock file "%s" does not exists' % file)
 
             attr_name = 'from_file_{}'.format(hashlib.md5(b(file)).hexdigest())
-            setattr(self.__class__, attr_name, cached_property(
-                lambda obj: jsonext.load_file(file), ttl=ttl))
+
+            def loader(obj):
+                return jsonext.load_file(file)
+
+            # __set_name__ is not called for attributes set on an existing
+            # class, name the loader so each file gets its own cache key
+            loader.__name__ = attr_name
+            setattr(self.__class__, attr_name,
+                    threaded_cached_property(loader, ttl=ttl))
 
         def decorator(func):
             @functools.wraps(func)
@@ -1,7 +1,16 @@
 # -*- coding:utf-8 -*-
 from django.contrib import admin, auth
+from django.core.cache import cache
 from django.utils import timezone
+from django.utils.html import format_html
+import functools
 import json
+import operator
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 __all__ = [
     'DropdownFilter', 'DropdownRelatedFilter', 'DropdownChoicesFilter',
@@ -27,11 +36,22 @@ class DropdownChoicesFilter(admin.ChoicesFieldListFilter):
     template = 'common/admin/dropdown_filter.html'
 
 
+# proxy models created by create_modeladmin, keyed by (model, name)
+_created_proxy_models = {}
+
+
 def create_modeladmin(model, model_admin, name=None,
                       verbose_name=None, verbose_name_plural=None):
     """
     Create proxy admin model dynamically.
+
+    The proxy model is created and registered only once for the same
+    model and name, later calls return the already created one.
     """
+    key = (model, name)
+    if key in _created_proxy_models:
+        return _created_proxy_models[key]
+
     _verbose_name = verbose_name
     _verbose_name_plural = verbose_name_plural or verbose_name
 
@@ -47,14 +67,19 @@ def create_modeladmin(model, model_admin, name=None,
     new_model = type(name, (model,), attrs)
 
     admin.site.register(new_model, model_admin)
+    _created_proxy_models[key] = new_model
+    return new_model
 
 
 def make_related_field(model, field, related_field):
     """
     Create related foreign field dynamically.
     """
-    def field_function(self, obj):
-        return getattr(getattr(obj, field), related_field)
+    getter = operator.attrgetter('{}.{}'.format(field, related_field))
+
+    # getter is bound as default argument for fast local variable access
+    def field_function(self, obj, getter=getter):
+        return getter(obj)
 
     field_function.short_description = model._meta.get_field(
         related_field).verbose_name
@@ -63,23 +88,47 @@ def make_related_field(model, field, related_field):
     return field_function
 
 
+def _pretty_json(value):
+    if orjson is not None:
+        try:
+            return orjson.dumps(
+                value, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS
+            ).decode('utf-8')
+        except TypeError:
+            # not supported by orjson, e.g. integers exceed 64-bit
+            pass
+    return json.dumps(value, indent=4, ensure_ascii=False)
+
+
 def make_json_field(field, short_description):
     """
     Create pre formatted json field.
     """
-    def field_function(self, obj):
-        value = getattr(obj, field)
+    getter = operator.attrgetter(field)
+
+    def field_function(self, obj, getter=getter):
+        value = getter(obj)
         if value is None:
             return '--'
-        return '<div><br><pre>{}</pre></div>'.format(
-            json.dumps(value, indent=4, ensure_ascii=False)
-        )
+        return format_html('<div><br><pre>{}</pre></div>',
+                           _pretty_json(value))
 
-    field_function.allow_tags = True
     field_function.short_description = short_description
     return field_function
 
 
+_ONE_DAY = timezone.timedelta(days=1)
+
+
+@functools.lru_cache(maxsize=32)
+def _last_days_lookups(today, days_count):
+    lookups = []
+    for x in range(days_count):
+        date = (today - timezone.timedelta(days=x)).isoformat()
+        lookups.append((date, date))
+    return tuple(lookups)
+
+
 class LastDaysFilter(admin.SimpleListFilter):
     title = ''
     parameter_name = ''
@@ -87,27 +136,30 @@ class LastDaysFilter(admin.SimpleListFilter):
     days_count = 7
     template = 'common/admin/dropdown_filter.html'
 
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._gte_key = cls.date_field + '__gte'
+        cls._lt_key = cls.date_field + '__lt'
+
     def lookups(self, request, model_admin):
         today = timezone.now().date()
-        lookups = []
-        for x in range(self.days_count):
-            date = (today - timezone.timedelta(days=x)).strftime('%Y-%m-%d')
-            lookups.append((date, date))
-        return lookups
+        return _last_days_lookups(today, self.days_count)
 
     def queryset(self, request, queryset):
         date_str = self.value()
         if date_str:
-            date = timezone.datetime(
-                *map(int, date_str.split('-')),
-                tzinfo=timezone.get_current_timezone())
+            # make_aware localizes pytz time zones properly, passing them
+            # as tzinfo directly results in the LMT offset
+            date = timezone.make_aware(
+                timezone.datetime.fromisoformat(date_str))
             queryset = queryset.filter(**{
-                self.date_field + '__gte': date,
-                self.date_field + '__lt': date + timezone.timedelta(days=1)
+                self._gte_key: date,
+                self._lt_key: date + _ONE_DAY
             })
         return queryset
 
 
+@functools.lru_cache(maxsize=None)
 def make_last_days_filter(field, days=7,
                           title=None, parameter_name=None,
                           template='common/admin/dropdown_filter.html'):
@@ -133,6 +185,10 @@ class IsNullOrNotFilter(admin.SimpleListFilter):
     parameter_name = ''
     nullable_field = ''
 
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._isnull_key = cls.nullable_field + '__isnull'
+
     def lookups(self, request, model_admin):
         return [
             ('1', 'Is Null'),
@@ -143,12 +199,11 @@ class IsNullOrNotFilter(admin.SimpleListFilter):
         param = self.value()
         if param:
             isnull = bool(int(param))
-            queryset = queryset.filter(**{
-                self.nullable_field + '__isnull': isnull
-            })
+            queryset = queryset.filter(**{self._isnull_key: isnull})
         return queryset
 
 
+@functools.lru_cache(maxsize=None)
 def make_isnull_or_not_filter(field, title=None, parameter_name=None):
     """
     Create is null or not filter for given field.
@@ -169,6 +224,10 @@ class NullableBooleanFilter(admin.SimpleListFilter):
     parameter_name = ''
     boolean_field = ''
 
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._isnull_key = cls.boolean_field + '__isnull'
+
     def lookups(self, request, model_admin):
         return [
             ('all', 'All'),
@@ -184,7 +243,7 @@ class NullableBooleanFilter(admin.SimpleListFilter):
         elif f == 'no':
             return queryset.filter(**{self.boolean_field: False})
         elif f == 'null':
-            return queryset.filter(**{self.boolean_field + '__isnull': True})
+            return queryset.filter(**{self._isnull_key: True})
         return queryset
 
     def choices(self, changelist):
@@ -197,6 +256,7 @@ class NullableBooleanFilter(admin.SimpleListFilter):
             }
 
 
+@functools.lru_cache(maxsize=None)
 def make_nullable_boolean_filter(field, title=None, parameter_name=None):
     _title = title or field.title()
     _parameter_name = parameter_name or field
@@ -214,24 +274,31 @@ class FKUserFilter(admin.SimpleListFilter):
     parameter_name = ''
     user_field = ''
     template = 'common/admin/dropdown_filter.html'
+    # seconds to cache the user list, users don't change frequently
+    users_cache_ttl = 60
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._id_key = cls.user_field + '_id'
 
     def lookups(self, request, model_admin):
         user_model = auth.get_user_model()
-        users = user_model.objects.all().order_by('pk')
-        return [
-            (u.id, u.username)
-            for u in users
-        ]
+        cache_key = 'FKUserFilter:users:{}'.format(
+            user_model._meta.label_lower)
+        return cache.get_or_set(
+            cache_key,
+            lambda: list(user_model.objects.order_by('pk').values_list(
+                'id', 'username').iterator(chunk_size=2000)),
+            self.users_cache_ttl)
 
     def queryset(self, request, queryset):
         user_id = self.value()
         if user_id:
-            queryset = queryset.filter(**{
-                self.user_field + '_id': int(user_id)
-            })
+            queryset = queryset.filter(**{self._id_key: user_id})
         return queryset
 
 
+@functools.lru_cache(maxsize=None)
 def make_fk_user_filter(field, title=None, parameter_name=None,
                         template='common/admin/dropdown_filter.html'):
     """
@@ -257,6 +324,11 @@ class RangeValueFilter(admin.SimpleListFilter):
     value_ranges = ()
     template = 'common/admin/dropdown_filter.html'
 
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._gte_key = cls.value_field + '__gte'
+        cls._lt_key = cls.value_field + '__lt'
+
     def lookups(self, request, model_admin):
         if not self.value_ranges:
             return []
@@ -269,36 +341,46 @@ class RangeValueFilter(admin.SimpleListFilter):
         return result
 
     def queryset(self, request, queryset):
-        if not self.value_ranges:
+        value = self.value()
+        if not self.value_ranges or value is None:
             return queryset
-        value = self.value
         if int(value) <= 0:
             return queryset.filter(**{
-                self.value_field + '__lt': self.value_ranges[0][0]
+                self._lt_key: self.value_ranges[0][0]
             })
         elif int(value) > len(self.value_ranges):
             return queryset.filter(**{
-                self.value_field + '__gte': self.value_ranges[-1][1]
+                self._gte_key: self.value_ranges[-1][1]
             })
         else:
             r = self.value_ranges[int(value)-1]
             return queryset.filter(**{
-                self.value_field + '__gte': r[0],
-                self.value_field + '__lt': r[1]
+                self._gte_key: r[0],
+                self._lt_key: r[1]
             })
 
 
 def make_range_value_filter(field, title=None, parameter_name=None,
                             value_ranges=None,
                             template='common/admin/dropdown_filter.html'):
+    # convert to hashable value to make use of the factory cache
+    value_ranges = tuple(tuple(r) for r in sorted(value_ranges))
+    return _make_range_value_filter(
+        field, title, parameter_name, value_ranges, template)
+
+
+@functools.lru_cache(maxsize=None)
+def _make_range_value_filter(field, title, parameter_name,
+                             value_ranges, template):
     _title = title or '{} Ranges'.format(field.title())
     _parameter_name = parameter_name or '{}_range'.format(field)
-    _value_ranges = sorted(value_ranges)
+    _value_ranges = value_ranges
     _template = template
 
     class _TheRangeValueFilter(RangeValueFilter):
-        title = _title,
+        title = _title
         parameter_name = _parameter_name
+        value_field = field
         value_ranges = _value_ranges
         template = _template
 
@@ -5,143 +5,313 @@ Handled exceptions raised by API requests.
 In addition Django's built in 403 and 404 exceptions are handled.
 (`django.http.Http404` and `django.core.exceptions.PermissionDenied`)
 """
-from __future__ import unicode_literals
-
+import datetime
+import decimal
 import functools
-import json
 import logging
 import math
 import traceback
-import six
 
+from asgiref.sync import iscoroutinefunction, sync_to_async
 from django.conf import settings
 from django.core.exceptions import PermissionDenied as dj_PermissionDenied
+from django.core.serializers.json import DjangoJSONEncoder
 from django.http.request import QueryDict
-from django.http.response import HttpResponseBase, JsonResponse, Http404
+from django.http.response import (
+    HttpResponse, HttpResponseBase, JsonResponse, Http404
+)
+from django.utils.duration import duration_iso_string
 
 from .. import exceptions as api_exc
 from ..decorators import mock
+from ..jsonext import fast_dumps, fast_loads
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 _logger = logging.getLogger(__name__)
 
+# encoders keep no state between calls, one instance is shared
+_json_encode = DjangoJSONEncoder().encode
 
-def _handle_exception(exc, context=None):
-    if isinstance(exc, api_exc.APIException):
-        headers = {}
-        if getattr(exc, 'auth_header', None):
-            headers['WWW-Authenticate'] = exc.auth_header
-        if getattr(exc, 'wait', None):
-            headers['Retry-After'] = '%d' % math.ceil(exc.wait)
-
-        if isinstance(exc.detail, api_exc.ErrorDetail):
-            data = {'code': exc.detail.code, 'message': exc.detail}
-        else:
-            data = {
-                'code': 'error_with_detail',
-                'message': 'Error with detail.',
-                'detail': exc.detail
-            }
-        response = JsonResponse(data, status=exc.status_code)
-        if headers:
-            for k, v in headers.items():
-                response[k] = v
-        return response
-    elif isinstance(exc, Http404):
-        return JsonResponse({
-            'code': api_exc.NotFound.default_code,
-            'message': api_exc.NotFound.default_detail
-        }, status=api_exc.NotFound.status_code)
-    elif isinstance(exc, dj_PermissionDenied):
-        return JsonResponse({
-            'code': api_exc.PermissionDenied.default_code,
-            'message': api_exc.PermissionDenied.default_detail
-        }, status=api_exc.PermissionDenied.status_code)
 
+def _encode_datetime(o):
+    """
+    Same output as DjangoJSONEncoder, which trims microseconds to
+    milliseconds and uses "Z" for UTC.
+    """
+    if o.microsecond:
+        r = o.isoformat(timespec='milliseconds')
     else:
-        # unexpected exception, log the traceback
-        _logger.warning(exc, exc_info=True)
-        if settings.DEBUG:
-            return JsonResponse({
-                'code': 'error_with_traceback',
-                'message': 'Error with traceback.',
-                'traceback': traceback.format_exc()
-            }, status=api_exc.APIException.status_code)
-        else:
-            return JsonResponse({
-                'code': api_exc.APIException.default_code,
-                'message': api_exc.APIException.default_detail
-            }, status=api_exc.APIException.status_code)
-
-
-def _parse_json(text):
-    if isinstance(text, six.string_types):
-        return json.loads(text)
-    return json.loads(text.decode())
-
-
-def _parse_request_body(request):
+        r = o.isoformat()
+    if r[-6:] == '+00:00':
+        r = r[:-6] + 'Z'
+    return r
+
+
+if orjson is not None:
+    _django_json_default = DjangoJSONEncoder().default
+    # values which orjson does not serialize as DjangoJSONEncoder does,
+    # dispatched by type, other types go to DjangoJSONEncoder
+    _json_encoders = {
+        datetime.datetime: _encode_datetime,
+        datetime.date: datetime.date.isoformat,
+        decimal.Decimal: str,
+        datetime.timedelta: duration_iso_string,
+    }
+
+    def _json_default(o):
+        o_type = type(o)
+        encoder = _json_encoders.get(o_type)
+        if encoder is None:
+            # resolve subclasses and other types by the mro only once
+            for base in o_type.__mro__[1:]:
+                encoder = _json_encoders.get(base)
+                if encoder is not None:
+                    break
+            else:
+                encoder = _django_json_default
+            _json_encoders[o_type] = encoder
+        return encoder(o)
+
+    # datetime values are formatted by _json_default, to keep the format
+    # of JsonResponse, orjson would output microseconds and "+00:00"
+    _json_options = orjson.OPT_PASSTHROUGH_DATETIME
+
+    def _json_dumps(data):
+        return fast_dumps(data, default=_json_default, option=_json_options,
+                          encoder=_json_encode)
+else:
+    def _json_dumps(data):
+        return _json_encode(data).encode('utf-8')
+
+_json_loads = fast_loads
+
+
+def _json_response(data, status=200, **kwargs):
+    """
+    Encode data to bytes once and respond with it, which is cheaper
+    than JsonResponse when orjson is available.
+    """
+    kwargs.setdefault('content_type', 'application/json')
+    return HttpResponse(_json_dumps(data), status=status, **kwargs)
+
+
+# arguments only accepted by JsonResponse
+_JSON_RESPONSE_KWARGS = ('encoder', 'safe', 'json_dumps_params')
+
+
+# encoded bodies of exceptions raised with the default detail and code,
+# keyed by exception class
+_default_bodies = {}
+
+
+def _encode_api_exception(exc):
+    detail = exc.detail
+    if isinstance(detail, api_exc.ErrorDetail):
+        default_detail = exc._get_default_detail()
+        if detail is default_detail:
+            cached = _default_bodies.get(type(exc))
+            if cached is not None and cached[0] is default_detail:
+                return cached[1]
+        body = _json_dumps({'code': detail.code, 'message': detail})
+        if detail is default_detail:
+            _default_bodies[type(exc)] = (default_detail, body)
+        return body
+
+    return _json_dumps({
+        'code': 'error_with_detail',
+        'message': 'Error with detail.',
+        'detail': detail
+    })
+
+
+def _handle_api_exception(exc):
+    response = HttpResponse(_encode_api_exception(exc),
+                            status=exc.status_code,
+                            content_type='application/json')
+
+    auth_header = getattr(exc, 'auth_header', None)
+    if auth_header:
+        response['WWW-Authenticate'] = auth_header
+    wait = getattr(exc, 'wait', None)
+    if wait:
+        response['Retry-After'] = '%d' % math.ceil(wait)
+    return response
+
+
+def _make_default_response(exc_class):
+    """
+    Create a response function for exceptions which always respond
+    with the default detail of exc_class, the body is encoded only once.
+    """
+    body = _json_dumps({
+        'code': exc_class.default_code,
+        'message': exc_class.default_detail
+    })
+    status = exc_class.status_code
+
+    def response(exc=None):
+        return HttpResponse(body, status=status,
+                            content_type='application/json')
+
+    return response
+
+
+_not_found_response = _make_default_response(api_exc.NotFound)
+_permission_denied_response = _make_default_response(
+    api_exc.PermissionDenied)
+_server_error_response = _make_default_response(api_exc.APIException)
+
+
+def _handle_unexpected_exception(exc):
+    # unexpected exception, log the traceback
+    _logger.warning(exc, exc_info=True)
+    if settings.DEBUG:
+        return _json_response({
+            'code': 'error_with_traceback',
+            'message': 'Error with traceback.',
+            'traceback': traceback.format_exc()
+        }, status=api_exc.APIException.status_code)
+    else:
+        return _server_error_response()
+
+
+# handlers are looked up by the exception type's mro
+_EXCEPTION_HANDLERS = {
+    api_exc.APIException: _handle_api_exception,
+    Http404: _not_found_response,
+    dj_PermissionDenied: _permission_denied_response,
+}
+
+
+def _handle_exception(exc, context=None):
+    for exc_type in type(exc).__mro__:
+        handler = _EXCEPTION_HANDLERS.get(exc_type)
+        if handler is not None:
+            return handler(exc)
+    return _handle_unexpected_exception(exc)
+
+
+_BODILESS_METHODS = frozenset(('GET', 'HEAD'))
+
+
+def _parse_request_body(request, method):
     """
     Parse data and cache as _JSON or _QUERY_DICT attribute of request
     for convenience and better performance.
+
+    Bodies of GET and HEAD requests are ignored, and a request is parsed
+    only once even if decorated by multiple api views.
     """
-    if not request.body:
+    if '_JSON' in request.__dict__ or '_QUERY_DICT' in request.__dict__:
+        return
+    if method in _BODILESS_METHODS:
         return
 
-    if request.content_type == 'application/json':
+    body = request.body
+    if not body:
+        return
+
+    # Django has already stripped parameters like charset from it
+    content_type = request.content_type
+    if content_type == 'application/json':
         try:
-            request._JSON = _parse_json(request.body)
+            request._JSON = _json_loads(body)
         except Exception as exc:
-            six.raise_from(api_exc.ParseError('Invalid JSON body.'), exc)
+            raise api_exc.ParseError('Invalid JSON body.') from exc
     # try to parse as json for malformed request
-    elif not request.content_type:
+    elif not content_type:
         try:
-            request._JSON = _parse_json(request.body)
-        except json.JSONDecodeError as exc:
+            request._JSON = _json_loads(body)
+        except ValueError:
+            # JSONDecodeError, or UnicodeDecodeError from stdlib json
             pass
     # let Django handle POST data in the default way
-    elif request.method == 'POST':
+    elif method == 'POST':
         pass
-    elif request.content_type == 'application/x-www-form-urlencoded':
-        request._QUERY_DICT = QueryDict(request.body)
+    elif content_type == 'application/x-www-form-urlencoded':
+        request._QUERY_DICT = QueryDict(body)
     # any other case should be leaved to the user
     else:
         pass
 
 
+def _check_user(request, staff_member_required):
+    if not request.user.is_authenticated:
+        raise api_exc.NotAuthenticated()
+    if staff_member_required and not request.user.is_staff:
+        raise api_exc.PermissionDenied()
+
+
 def api_view(view_func=None,
              methods=('GET', 'POST'), parse_body=False,
              login_required=False, staff_member_required=False,
              **response_kwargs):
+    """
+    Wrap a view to respond data returned by it as JSON, and respond
+    exceptions raised by it as JSON errors.
 
-    def decorator(func):
-        @functools.wraps(func)
-        def wrapper(request, *args, **kwargs):
-            try:
-                if login_required or staff_member_required:
-                    if not request.user.is_authenticated():
-                        raise api_exc.NotAuthenticated()
-                if staff_member_required:
-                    if not request.user.is_staff:
-                        raise api_exc.PermissionDenied()
+    Coroutine views are wrapped by an async wrapper, in which the user
+    is checked in a thread, since loading it may query the database.
+    """
+    if any(k in response_kwargs for k in _JSON_RESPONSE_KWARGS):
+        make_response = functools.partial(JsonResponse, **response_kwargs)
+    else:
+        make_response = functools.partial(_json_response, **response_kwargs)
 
-                if request.method not in methods:
-                    raise api_exc.MethodNotAllowed(request.method)
+    methods = frozenset(methods)
+    auth_required = login_required or staff_member_required
 
-                # parse and cache QUERY_DICT or JSON data for request
-                if parse_body:
-                    _parse_request_body(request)
+    def check_request(request):
+        method = request.method
+        if method not in methods:
+            raise api_exc.MethodNotAllowed(method)
 
+        # parse and cache QUERY_DICT or JSON data for request
+        if parse_body:
+            _parse_request_body(request, method)
+
+    def decorator(func):
+        if iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(request, *args, **kwargs):
                 try:
-                    result = func(request, *args, **kwargs)
+                    if auth_required:
+                        await sync_to_async(_check_user)(
+                            request, staff_member_required)
+                    check_request(request)
+
+                    result = await func(request, *args, **kwargs)
+                    if isinstance(result, HttpResponseBase):
+                        return result
+
+                    response = {'code': 'ok', 'data': result}
+                    return make_response(response)
                 except mock.KeyMissing as err:
-                    six.reraise(api_exc.MockKeyMissing,
-                                api_exc.MockKeyMissing(err.key), None)
+                    return _handle_exception(api_exc.MockKeyMissing(err.key))
+                except Exception as exc:
+                    return _handle_exception(exc)
+
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(request, *args, **kwargs):
+            try:
+                if auth_required:
+                    _check_user(request, staff_member_required)
+                check_request(request)
 
-                if result and isinstance(result, HttpResponseBase):
+                result = func(request, *args, **kwargs)
+                if isinstance(result, HttpResponseBase):
                     return result
 
                 response = {'code': 'ok', 'data': result}
-                return JsonResponse(response, **response_kwargs)
+                return make_response(response)
+            except mock.KeyMissing as err:
+                return _handle_exception(api_exc.MockKeyMissing(err.key))
             except Exception as exc:
                 return _handle_exception(exc)
 
@@ -157,32 +327,61 @@ def api_token_required(validator,
                        header='HTTP_AUTHORIZATION',
                        token_field='token',
                        methods=('GET', 'POST'),
-                       exclude_methods=('HEAD', 'OPTION'),
+                       exclude_methods=('HEAD', 'OPTIONS'),
                        **response_kwargs):
     """
     Require API token provided, either through header or request parameters.
     """
+    exclude_methods = frozenset(exclude_methods or ())
+    if iscoroutinefunction(validator):
+        async_validator = validator
+    else:
+        async_validator = sync_to_async(validator)
+
+    def get_token(request):
+        # header take precedence over parameters
+        if header:
+            token = request.META.get(header)
+            if token is not None:
+                return token
+        if request.method == 'GET':
+            return request.GET.get(token_field)
+
+        # body parsed by api_view, request.POST is evaluated only if needed
+        data = request.__dict__.get('_JSON')
+        if data is None:
+            data = request.__dict__.get('_QUERY_DICT')
+            if data is None:
+                data = request.POST
+        if isinstance(data, dict):
+            return data.get(token_field)
+        return None
 
     def decorator(view_func):
+        if iscoroutinefunction(view_func):
+            @api_view(methods=methods, parse_body=True, **response_kwargs)
+            @functools.wraps(view_func)
+            async def async_wrapper(request, *args, **kwargs):
+                if request.method not in exclude_methods:
+                    token = get_token(request)
+                    if not token:
+                        raise api_exc.NotAuthenticated()
+                    if not await async_validator(request, token):
+                        raise api_exc.AuthenticationFailed()
+
+                return await view_func(request, *args, **kwargs)
+
+            return async_wrapper
+
         @api_view(methods=methods, parse_body=True, **response_kwargs)
         @functools.wraps(view_func)
         def wrapper(request, *args, **kwargs):
-            if exclude_methods and request.method in exclude_methods:
-                return view_func(request, *args, **kwargs)
-
-            # header take precedence over parameters
-            if header and header in request.META:
-                token = request.META[header]
-            elif request.method == 'GET':
-                token = request.GET.get(token_field)
-            else:
-                token = getattr(request, '_JSON', getattr(
-                    request, '_QUERY_DICT', request.POST)).get('token')
-
-            if not token:
-                raise api_exc.NotAuthenticated()
-            if not validator(request, token):
-                raise api_exc.AuthenticationFailed()
+            if request.method not in exclude_methods:
+                token = get_token(request)
+                if not token:
+                    raise api_exc.NotAuthenticated()
+                if not validator(request, token):
+                    raise api_exc.AuthenticationFailed()
 
             return view_func(request, *args, **kwargs)
 
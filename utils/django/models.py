@@ -1,8 +1,14 @@
 from __future__ import unicode_literals
 
-from django.db import models
+from django.db import connections, models, router
 from django.utils import timezone
-import json
+
+from ..jsonext import fast_dumps, fast_loads
+
+
+def _json_dumps(value):
+    return fast_dumps(value).decode('utf-8')
+
 
 # Create your models here.
 
@@ -14,6 +20,10 @@ class AbstractKVStore(models.Model):
     update_at = models.DateTimeField('Update at', auto_now=True)
     expire_at = models.DateTimeField('Expire at', null=True, blank=True)
 
+    # the v column is TEXT, so the dumps function must return str
+    _json_dumps = staticmethod(_json_dumps)
+    _json_loads = staticmethod(fast_loads)
+
     class Meta:
         abstract = True
 
@@ -34,18 +44,57 @@ class AbstractKVStore(models.Model):
     def get_json(cls, key, default=None):
         value = cls.get(key, default=default)
         if value is not default:
-            value = json.loads(value)
+            value = cls._json_loads(value)
         return value
 
+    @classmethod
+    def get_many(cls, keys, default=None):
+        """
+        Get values of many keys with one query, as a dict mapping each
+        key to its value, default is used for missing or expired keys.
+        """
+        result = dict.fromkeys(keys, default)
+        if not result:
+            return result
+        now = timezone.now()
+        rows = cls.objects.filter(k__in=list(result)).values_list(
+            'k', 'v', 'expire_at')
+        for k, v, expire_at in rows:
+            if not expire_at or expire_at >= now:
+                result[k] = v
+        return result
+
+    @classmethod
+    def get_json_many(cls, keys, default=None):
+        result = cls.get_many(keys, default=default)
+        loads = cls._json_loads
+        for k, v in result.items():
+            if v is not default:
+                result[k] = loads(v)
+        return result
+
     @classmethod
     def set(cls, key, value, expire_at=None):
-        obj, created = cls.objects.update_or_create(
-            k=key, defaults={'v': value, 'expire_at': expire_at})
+        features = connections[router.db_for_write(cls)].features
+        if not getattr(features, 'supports_update_conflicts', False):
+            cls.objects.update_or_create(
+                k=key, defaults={'v': value, 'expire_at': expire_at})
+            return True
+
+        # upsert with one query, create_at is kept on conflict
+        kwargs = {}
+        if features.supports_update_conflicts_with_target:
+            kwargs['unique_fields'] = ['k']
+        cls.objects.bulk_create(
+            [cls(k=key, v=value, expire_at=expire_at)],
+            update_conflicts=True,
+            update_fields=['v', 'expire_at', 'update_at'],
+            **kwargs)
         return True
 
     @classmethod
     def set_json(cls, key, value, expire_at=None):
-        value = json.dumps(value)
+        value = cls._json_dumps(value)
         return cls.set(key, value, expire_at=expire_at)
 
     @classmethod
@@ -40,6 +40,10 @@ variable_re = re.compile(r"""
     )                   # braces end
 """, re.IGNORECASE | re.VERBOSE)
 
+quoted_re = re.compile(r'^([\'"])(.*)\1$')
+unescape_re = re.compile(r'\\([^$])')
+blank_re = re.compile(r'^\s*(?:#.*)?$')
+
 
 def _walk_to_root(path):
     """
@@ -126,7 +130,7 @@ def parse_dotenv(content):
             value = value.strip()
 
             # Remove surrounding quotes
-            m2 = re.match(r'^([\'"])(.*)\1$', value)
+            m2 = quoted_re.match(value)
 
             if m2:
                 quotemark, value = m2.groups()
@@ -135,7 +139,7 @@ def parse_dotenv(content):
 
             # Unescape all chars except $ so variables can be escaped properly
             if quotemark == '"':
-                value = re.sub(r'\\([^$])', r'\1', value)
+                value = unescape_re.sub(r'\1', value)
 
             if quotemark != "'":
                 # Substitute variables in a value
@@ -154,7 +158,7 @@ def parse_dotenv(content):
 
             env[key] = value
 
-        elif not re.search(r'^\s*(?:#.*)?$', line):  # not comment or blank
+        elif not blank_re.search(line):  # not comment or blank
             warnings.warn(
                 "Line {0} doesn't match format".format(repr(line)),
                 SyntaxWarning
@@ -1,63 +1,120 @@
 # -*- coding:utf-8 -*-
 
+import functools
 import math
-import six
+import operator
 
 from . import http_status as status
 
 
+def _map_details(data, func):
+    """
+    Apply func to every item of a nested list and dict structure, which
+    is not a list or dict itself, and return the result in the same
+    structure.
+
+    The structure is walked with an explicit stack instead of recursion,
+    a list or dict which contains itself raises ValueError.
+    """
+    # plain strings are by far the most common details
+    data_type = type(data)
+    if data_type is str or data_type is ErrorDetail:
+        return func(data)
+    if isinstance(data, list):
+        result = []
+    elif isinstance(data, dict):
+        result = {}
+    else:
+        return func(data)
+
+    # ids of the containers on the current path, an entry with dst None
+    # marks the point where its container has been fully walked
+    active = set()
+    stack = [(data, result)]
+    while stack:
+        src, dst = stack.pop()
+        if dst is None:
+            active.discard(id(src))
+            continue
+        active.add(id(src))
+        stack.append((src, None))
+        is_list = isinstance(src, list)
+        for key, value in (enumerate(src) if is_list else src.items()):
+            value_type = type(value)
+            if value_type is str or value_type is ErrorDetail:
+                item = func(value)
+            elif isinstance(value, (list, dict)):
+                if id(value) in active:
+                    raise ValueError('error details contain a reference '
+                                     'cycle')
+                item = [] if isinstance(value, list) else {}
+                stack.append((value, item))
+            else:
+                item = func(value)
+            if is_list:
+                dst.append(item)
+            else:
+                dst[key] = item
+    return result
+
+
 def _get_error_details(data, default_code=None):
     """
     Descend into a nested data structure, forcing any
     lazy translation strings or strings into `ErrorDetail`.
     """
-    if isinstance(data, list):
-        ret = [
-            _get_error_details(item, default_code) for item in data
-        ]
-        return ret
-    elif isinstance(data, dict):
-        ret = {
-            key: _get_error_details(value, default_code)
-            for key, value in data.items()
-        }
-        return ret
+    def to_error_detail(text):
+        return ErrorDetail(text, getattr(text, 'code', default_code))
 
-    text = data
-    code = getattr(data, 'code', default_code)
-    return ErrorDetail(text, code)
+    return _map_details(data, to_error_detail)
 
 
 def _get_codes(detail):
-    if isinstance(detail, list):
-        return [_get_codes(item) for item in detail]
-    elif isinstance(detail, dict):
-        return {key: _get_codes(value) for key, value in detail.items()}
-    return detail.code
+    return _map_details(detail, operator.attrgetter('code'))
 
 
 def _get_full_details(detail):
-    if isinstance(detail, list):
-        return [_get_full_details(item) for item in detail]
-    elif isinstance(detail, dict):
-        return {key: _get_full_details(value) for key, value in detail.items()}
-    return {
-        'message': detail,
-        'code': detail.code
-    }
+    return _map_details(detail, lambda d: {
+        'message': d,
+        'code': d.code
+    })
+
 
+@functools.lru_cache(maxsize=256)
+def _format_detail_cached(template, **kwargs):
+    return template.format(**kwargs)
 
-class ErrorDetail(six.text_type):
+
+def _format_detail(template, **kwargs):
+    """
+    Format a default detail template, results are cached since the same
+    method, media type or key tends to be reported over and over.
+    """
+    try:
+        return _format_detail_cached(template, **kwargs)
+    except TypeError:
+        # unhashable arguments, e.g. a list of methods, are not cached
+        return template.format(**kwargs)
+
+
+class ErrorDetail(str):
     """
     A string-like object that can additionally have a code.
     """
-    code = None
+    __slots__ = ('code',)
 
     def __new__(cls, string, code=None):
-        self = super(ErrorDetail, cls).__new__(cls, string)
+        # details are not mutated, an equal one can be shared
+        if type(string) is cls and string.code == code:
+            return string
+        self = super().__new__(cls, string)
         self.code = code
         return self
 
+    def __reduce__(self):
+        # required by pickle protocols 0 and 1 since __slots__ is defined
+        return (type(self), (str(self), self.code))
+
 
 class APIException(Exception):
     """
@@ -69,17 +126,33 @@ class APIException(Exception):
     default_code = 'error'
 
     def __init__(self, detail=None, code=None, status=None):
+        if status:
+            self.status_code = status
+        if detail is None and code is None:
+            self.detail = self._get_default_detail()
+            return
+
         if detail is None:
             detail = self.default_detail
         if code is None:
             code = self.default_code
-        if status:
-            self.status_code = status
-
         self.detail = _get_error_details(detail, code)
 
+    @classmethod
+    def _get_default_detail(cls):
+        """
+        Return the `ErrorDetail` of the class' default detail and code,
+        which is built only once for each class.
+        """
+        cached = cls.__dict__.get('_default_detail_cache')
+        if cached is None or cached[0] is not cls.default_detail:
+            detail = ErrorDetail(cls.default_detail, cls.default_code)
+            cached = (cls.default_detail, detail)
+            cls._default_detail_cache = cached
+        return cached[1]
+
     def __str__(self):
-        return six.text_type(self.detail)
+        return str(self.detail)
 
     def get_codes(self):
         """
@@ -161,8 +234,8 @@ class MethodNotAllowed(APIException):
 
     def __init__(self, method, detail=None, code=None):
         if detail is None:
-            detail = self.default_detail.format(method=method)
-        super(MethodNotAllowed, self).__init__(detail, code)
+            detail = _format_detail(self.default_detail, method=method)
+        super().__init__(detail, code)
 
 
 class NotAcceptable(APIException):
@@ -172,7 +245,7 @@ class NotAcceptable(APIException):
 
     def __init__(self, detail=None, code=None, available_renderers=None):
         self.available_renderers = available_renderers
-        super(NotAcceptable, self).__init__(detail, code)
+        super().__init__(detail, code)
 
 
 class UnsupportedMediaType(APIException):
@@ -182,8 +255,9 @@ class UnsupportedMediaType(APIException):
 
     def __init__(self, media_type, detail=None, code=None):
         if detail is None:
-            detail = self.default_detail.format(media_type=media_type)
-        super(UnsupportedMediaType, self).__init__(detail, code)
+            detail = _format_detail(self.default_detail,
+                                    media_type=media_type)
+        super().__init__(detail, code)
 
 
 class Throttled(APIException):
@@ -194,17 +268,18 @@ class Throttled(APIException):
     default_code = 'throttled'
 
     def __init__(self, wait=None, detail=None, code=None):
-        if detail is None:
-            detail = self.default_detail
         if wait is not None:
             wait = math.ceil(wait)
             if wait > 1:
                 extra = self.extra_detail_plural
             else:
                 extra = self.extra_detail_singular
-            detail = ' '.join((detail, extra))
+            if detail is None:
+                detail = self.default_detail
+            detail = '%s %s' % (detail, extra.format(wait=wait))
         self.wait = wait
-        super(Throttled, self).__init__(detail, code)
+        # without wait, the shared default detail is used
+        super().__init__(detail, code)
 
 
 class MockKeyMissing(APIException):
@@ -215,5 +290,5 @@ class MockKeyMissing(APIException):
     def __init__(self, key, detail=None, code=None):
         self.key = key
         if detail is None:
-            detail = self.default_detail.format(key=key)
-        super(MockKeyMissing, self).__init__(detail, code)
+            detail = _format_detail(self.default_detail, key=key)
+        super().__init__(detail, code)
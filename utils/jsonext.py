@@ -21,28 +21,50 @@ Support "@import(another.json)" syntax.
 """
 
 import json
+import math
 import os
 import re
-
-IMPORT_RE = re.compile(r'"@import\((.+)\)"')
-COMMENTS_RE = re.compile(
-    r'//.*?$|/\*.*?\*/|\'(?:\\.|[^\\\'])*\'|"(?:\\.|[^\\"])*"',
-    re.DOTALL | re.MULTILINE
+import stat
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+IMPORT_RE = re.compile(r'"@import\(([^"\n]+)\)"')
+# Tokens for the single pass which replaces imports, strips comments and
+# trailing commas.
+# Every alternative is linear, strings are matched before comments so that
+# comment markers inside strings are kept, unterminated strings and
+# comments fall through to the last alternative and are copied as is.
+_TOKEN_RE = re.compile(
+    r'"(?:\\.|[^"\\])*"'
+    r"|'(?:\\.|[^'\\])*'"
+    r'|//[^\n]*'
+    r'|/\*.*?\*/'
+    r'|\s+'
+    r'|[^"\'/,}\]\s]+'
+    r'|.',
+    re.DOTALL
 )
-TRAILING_OBJECT_COMMAS_RE = re.compile(
-    r'(,)\s*}(?=([^"\\]*(\\.|"([^"\\]*\\.)*[^"\\]*"))*[^"]*$)')
-TRAILING_ARRAY_COMMAS_RE = re.compile(
-    r'(,)\s*\](?=([^"\\]*(\\.|"([^"\\]*\\.)*[^"\\]*"))*[^"]*$)')
+# may find false positives in strings, which are handled by the full pass
+_TRAILING_COMMA_PROBE_RE = re.compile(r',\s*[}\]]')
+
+# orjson silently decodes integers out of the 64-bit range as float,
+# content with such long numbers is decoded by json to keep them exact
+_LONG_NUMBER_RE = re.compile(r'\d{19}')
+_LONG_NUMBER_BYTES_RE = re.compile(br'\d{19}')
 
 
 def load_file(path, *, cls=None, object_hook=None, parse_float=None,
               parse_int=None, parse_constant=None, object_pairs_hook=None,
               **kw):
-    return load(open(path, 'r', encoding='utf8'),
-                cls=cls, object_hook=object_hook,
-                parse_float=parse_float, parse_int=parse_int,
-                parse_constant=parse_constant,
-                object_pairs_hook=object_pairs_hook, **kw)
+    with open(path, 'r', encoding='utf8') as fp:
+        return load(fp,
+                    cls=cls, object_hook=object_hook,
+                    parse_float=parse_float, parse_int=parse_int,
+                    parse_constant=parse_constant,
+                    object_pairs_hook=object_pairs_hook, **kw)
 
 
 def load(fp, *, cls=None, object_hook=None, parse_float=None,
@@ -51,67 +73,158 @@ def load(fp, *, cls=None, object_hook=None, parse_float=None,
         root = os.path.dirname(os.path.abspath(fp.name))
     else:
         root = os.path.abspath(os.path.curdir)
-    content = fp.read()
-    content = _replace_import(content, root)
-    content = _remove_comment(content)
-    content = _fix_trailing_commas(content)
-    return json.loads(content,
-                      cls=cls, object_hook=object_hook,
-                      parse_float=parse_float, parse_int=parse_int,
-                      parse_constant=parse_constant,
-                      object_pairs_hook=object_pairs_hook, **kw)
+    content = _preprocess(fp.read(), root, {})
+    return _json_loads(content,
+                       cls=cls, object_hook=object_hook,
+                       parse_float=parse_float, parse_int=parse_int,
+                       parse_constant=parse_constant,
+                       object_pairs_hook=object_pairs_hook, **kw)
 
 
 def loads(string, *, encoding=None, cls=None, object_hook=None, parse_float=None,
           parse_int=None, parse_constant=None, object_pairs_hook=None, **kw):
     root = os.path.abspath(os.path.curdir)
-    string = _replace_import(string, root)
-    string = _remove_comment(string)
-    string = _fix_trailing_commas(string)
-    return json.loads(string, encoding=encoding,
-                      cls=cls, object_hook=object_hook,
-                      parse_float=parse_float, parse_int=parse_int,
-                      parse_constant=parse_constant,
-                      object_pairs_hook=object_pairs_hook, **kw)
-
-
-def _read_file(path):
+    string = _preprocess(string, root, {})
+    # encoding is ignored, json.loads does not accept it since Python 3.9
+    return _json_loads(string,
+                       cls=cls, object_hook=object_hook,
+                       parse_float=parse_float, parse_int=parse_int,
+                       parse_constant=parse_constant,
+                       object_pairs_hook=object_pairs_hook, **kw)
+
+
+def _is_finite(obj):
+    """Check there is no NaN or Infinity float in obj."""
+    stack = [obj]
+    while stack:
+        o = stack.pop()
+        if isinstance(o, float):
+            if not math.isfinite(o):
+                return False
+        elif isinstance(o, dict):
+            stack.extend(o.values())
+        elif isinstance(o, (list, tuple)):
+            stack.extend(o)
+    return True
+
+
+def fast_dumps(obj, *, default=None, option=0, encoder=None):
+    """
+    Encode obj to JSON bytes, with orjson if available, which is much
+    faster than the json module.
+
+    Non-str dict keys are allowed as by json, `default` and `option` are
+    passed to orjson. Values which orjson does not encode the same as
+    json fall back to `encoder`, json.dumps by default, which must
+    return str: integers out of the 64-bit range, and NaN and Infinity,
+    which orjson would output as null.
+    """
+    if orjson is not None:
+        try:
+            result = orjson.dumps(obj, default=default,
+                                  option=option | orjson.OPT_NON_STR_KEYS)
+        except orjson.JSONEncodeError:
+            pass
+        else:
+            # obj is checked only if there may be NaN or Infinity
+            if b'null' not in result or _is_finite(obj):
+                return result
+    return (encoder or json.dumps)(obj).encode('utf-8')
+
+
+def fast_loads(s):
+    """
+    Decode JSON str or bytes, with orjson if available, which is much
+    faster than the json module.
+
+    Content with long numbers, which may be integers out of the 64-bit
+    range, and content rejected by orjson, e.g. NaN and Infinity, are
+    decoded by json, so the result is the same as json.loads.
+    """
+    if orjson is not None:
+        if isinstance(s, str):
+            long_number = _LONG_NUMBER_RE.search(s)
+        else:
+            long_number = _LONG_NUMBER_BYTES_RE.search(s)
+        if long_number is None:
+            try:
+                return orjson.loads(s)
+            except orjson.JSONDecodeError:
+                # json reports errors the same way as before
+                pass
+    return json.loads(s)
+
+
+def _json_loads(string, **kwargs):
+    """
+    Decode string with fast_loads if no custom decoding hooks are given,
+    else with the json module.
+    """
+    if all(v is None for v in kwargs.values()):
+        return fast_loads(string)
+    return json.loads(string, **kwargs)
+
+
+def _read_file(path, cache):
     root = os.path.dirname(os.path.abspath(path))
     with open(path, 'r', encoding='utf8') as fd:
         content = fd.read()
-    content = _replace_import(content, root)
+    content = _preprocess(content, root, cache)
     return content
 
 
-def _replace_import(string, root):
-    def include(match):
-        m = match.group(1).strip()
-        path = os.path.normpath(os.path.abspath(os.path.join(root, m)))
-        if not os.path.exists(path):
+def _import(name, root, cache):
+    """
+    Return the processed content of an imported file.
+
+    Files imported more than once in one load, e.g. by a diamond-shaped
+    import graph, are resolved and read only once, cache maps absolute
+    paths to their processed content.
+    """
+    # root is always absolute, normpath is enough
+    path = os.path.normpath(os.path.join(root, name.strip()))
+    content = cache.get(path)
+    if content is None:
+        try:
+            mode = os.stat(path).st_mode
+        except FileNotFoundError:
             raise OSError("file %s not exists" % path)
-        if not os.path.isfile(path):
+        if not stat.S_ISREG(mode):
             raise OSError("path %s is not a file" % path)
-        content = _read_file(path)
-        return content
-
-    string = IMPORT_RE.sub(include, string)
-    return string
-
-
-def _remove_comment(string):
-    def uncomment(match):
-        s = match.group(0)
-        if s[0] == '/':
-            return ''
-        return s
-
-    string = COMMENTS_RE.sub(uncomment, string)
-    return string
+        content = cache[path] = _read_file(path, cache)
+    return content
 
 
-def _fix_trailing_commas(string):
-    # Fix objects {} first.
-    string = TRAILING_OBJECT_COMMAS_RE.sub("}", string)
-    # Now fix arrays/lists [].
-    string = TRAILING_ARRAY_COMMAS_RE.sub("]", string)
-    return string
+def _preprocess(string, root, cache):
+    """
+    Replace "@import(path)" strings with content of the imported files,
+    remove comments and trailing commas, all in one pass.
+    """
+    # content from a well-formed serializer needs no work at all
+    if ('/' not in string and '@import(' not in string and
+            not _TRAILING_COMMA_PROBE_RE.search(string)):
+        return string
+
+    out = []
+    append = out.append
+    comma = -1  # position in out of the last comma, which may be trailing
+    for match in _TOKEN_RE.finditer(string):
+        token = match.group()
+        first = token[0]
+        if first == '/' and len(token) > 1 and token[1] in '/*':
+            continue
+        if token.isspace():
+            append(token)
+        elif token == ',':
+            comma = len(out)
+            append(token)
+        else:
+            if comma >= 0 and (first == '}' or first == ']'):
+                out[comma] = ''
+            comma = -1
+            if first == '"' and token.startswith('"@import('):
+                m = IMPORT_RE.fullmatch(token)
+                if m:
+                    token = _import(m.group(1), root, cache)
+            append(token)
+    return ''.join(out)
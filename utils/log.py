@@ -1,6 +1,7 @@
 # -*- coding:utf-8 -*-
 from __future__ import absolute_import, print_function, unicode_literals
 from contextlib import contextmanager
+import io
 import logging
 import logging.handlers
 import sys
@@ -90,15 +91,15 @@ class LoggerMixin(object):
     # The log property is the de-facto standard in most programming languages
     @property
     def log(self):
-        try:
-            return self._log
-        except AttributeError:
-            self._log = logging.root.getChild(
-                '{}.{}'.format(
-                    self.__class__.__module__,
-                    self.__class__.__name__
-                ))
-            return self._log
+        # the logger is shared by all instances of a class, it is looked up
+        # in the class's own __dict__, thus subclasses get their own logger
+        cls = self.__class__
+        logger = cls.__dict__.get('_class_log')
+        if logger is None:
+            logger = logging.root.getChild(
+                '{}.{}'.format(cls.__module__, cls.__name__))
+            cls._class_log = logger
+        return logger
 
 
 class StreamLogWriter(object):
@@ -108,19 +109,20 @@ class StreamLogWriter(object):
     def __init__(self, logger, level):
         self.logger = logger
         self.level = level
-        self._buffer = []
+        self._buffer = io.StringIO()
 
     def write(self, message):
-        self._buffer.append(message)
+        self._buffer.write(message)
         if message.endswith('\n'):
             self.flush()
 
     def flush(self):
         """Ensure all logging output has been flushed."""
-        output = ''.join(self._buffer).rstrip()
+        output = self._buffer.getvalue().rstrip()
         if output:
             self.logger.log(self.level, output)
-            self._buffer = []
+        # whitespace only output is dropped instead of piling up
+        self._buffer = io.StringIO()
 
     def isatty(self):
         """
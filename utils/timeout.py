@@ -1,7 +1,6 @@
 # -*- coding:utf-8 -*-
 import signal
 import threading
-import time
 
 
 def sql_query_may_timeout(*args, timeout=0, interval=1, **kwargs):
@@ -10,6 +9,9 @@ def sql_query_may_timeout(*args, timeout=0, interval=1, **kwargs):
     keep running the query, so this is only useful when you just exit
     the main thread, then the daemonized thread will be abandoned.
 
+    The interval argument is kept for compatibility and is not used,
+    the worker thread is joined with timeout directly.
+
     Reference:
         1. https://stackoverflow.com/a/16494559
         2. https://docs.python.org/2/library/threading.html
@@ -27,22 +29,10 @@ def sql_query_may_timeout(*args, timeout=0, interval=1, **kwargs):
 
     worker = threading.Thread(target=_query, args=(result, ),
                               daemon=True)
-
-    def _wait_timeout():
-        deadline = time.time() + timeout
-        while True:
-            if not worker.is_alive():
-                return
-            if time.time() > deadline:
-                return
-            time.sleep(interval)
-
-    timer = threading.Thread(target=_wait_timeout)
     worker.start()
-    timer.start()
 
     # wait work being finished or timeout
-    timer.join()
+    worker.join(timeout)
     if worker.is_alive():
         raise TimeoutError('worker thread timeout after %s seconds' % timeout)
     elif not result:
@@ -69,8 +59,10 @@ class timeout(object):
         raise TimeoutError(self.error_message)
 
     def __enter__(self):
-        signal.signal(signal.SIGALRM, self.handle_timeout)
-        signal.alarm(self.seconds)
+        # setitimer accepts float seconds, thus sub-second timeouts work
+        self._old_handler = signal.signal(signal.SIGALRM, self.handle_timeout)
+        signal.setitimer(signal.ITIMER_REAL, self.seconds)
 
     def __exit__(self, type, value, traceback):
-        signal.alarm(0)
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, self._old_handler)
@@ -1,14 +1,24 @@
 # -*- coding:utf-8 -*-
-from datetime import datetime, date, timedelta
+from datetime import datetime, date, timedelta, timezone as dt_timezone
+import functools
 import os
-import pytz
+import zoneinfo
+
+utc = dt_timezone.utc
+
+
+@functools.lru_cache(maxsize=None)
+def _get_timezone(name):
+    return zoneinfo.ZoneInfo(name)
 
 
 def get_current_timezone():
+    # the environment is checked on every call, time zones are cached
+    # by name, thus changing TZ at runtime still takes effect
     tz = os.getenv('TZ') or os.getenv('TIME_ZONE') or os.getenv('TIMEZONE')
     if tz:
-        return pytz.timezone(tz)
-    return pytz.utc
+        return _get_timezone(tz)
+    return utc
 
 
 def localtime(value=None, timezone=None):
@@ -53,11 +63,7 @@ def now(tz=None):
     Returns an aware datetime.datetime with utc timezone.
     For naive datetime, please use the standard datetime.now() function.
     """
-    # timeit shows that datetime.now(tz=utc) is 24% slower
-    value = datetime.utcnow().replace(tzinfo=pytz.utc)
-    if tz:
-        value = value.astimezone(tz)
-    return value
+    return datetime.now(tz or utc)
 
 
 # By design, these four functions don't perform any checks on their arguments.
@@ -92,6 +98,12 @@ def is_naive(value):
 def make_aware(value, timezone=None, is_dst=None):
     """
     Makes a naive datetime.datetime in a given time zone aware.
+
+    For zoneinfo time zones (the default) ambiguous or nonexistent local
+    times are resolved with ``fold`` instead of raising like pytz does.
+    ``is_dst`` picks the side of the transition where DST is (or is not)
+    in effect; when it is None, or the time is not near a transition,
+    the ``fold=0`` offset is used.
     """
     if timezone is None:
         timezone = get_current_timezone()
@@ -103,8 +115,13 @@ def make_aware(value, timezone=None, is_dst=None):
         if is_aware(value):
             raise ValueError(
                 "make_aware expects a naive datetime, got %s" % value)
-        # This may be wrong around DST changes!
-        return value.replace(tzinfo=timezone)
+        value = value.replace(tzinfo=timezone)
+        if is_dst is not None and bool(value.dst()) != is_dst:
+            # the other fold differs only around DST transitions
+            other = value.replace(fold=1 - value.fold)
+            if bool(other.dst()) == is_dst:
+                return other
+        return value
 
 
 def make_naive(value, timezone=None):